@@ -5,10 +5,19 @@ import uuid
 import subprocess
 import requests
 import random
-from typing import List, Dict, Optional
+import shutil
+import threading
+import time
+import tempfile
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response, FileResponse
+from urllib.parse import quote
 from pydantic import BaseModel
 import google.generativeai as genai
 import PyPDF2
@@ -31,25 +40,46 @@ logging.basicConfig(
 )
 logger = logging.getLogger("api")
 
-app = FastAPI(title="AI Podcast Generator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    storage_task = asyncio.create_task(run_storage_sweeps())
+    yield
+    storage_task.cancel()
+    render_executor.shutdown(wait=False, cancel_futures=True)
 
-# Mount Static Files
+app = FastAPI(title="AI Podcast Generator", lifespan=lifespan)
+
+# Media Storage (served by serve_media under /audio)
 TEMP_DIR = "temp_audio"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-app.mount("/audio", StaticFiles(directory=TEMP_DIR), name="audio")
+# When set (e.g. "/protected-media/"), downloads are handed to a local nginx via X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+# UUID-named media is written once and never changed, so it can be cached forever
+IMMUTABLE_MEDIA_PATTERN = re.compile(r"^(podcast|video)_[0-9a-f-]{36}(\.mp3|\.mp4|\.peaks\.npz)$")
+PODCAST_AUDIO_PATTERN = re.compile(r"^podcast_[0-9a-f-]{36}\.mp3$")
+# Video renders are memory/CPU heavy; cap how many run at once so they can't starve the instance.
+# They run in separate processes so frame drawing never holds the API process's GIL.
+MAX_CONCURRENT_RENDERS = int(os.getenv("MAX_CONCURRENT_RENDERS", "1"))
+render_semaphore = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+# spawn, not fork: forking a process with live event-loop and worker threads can deadlock
+render_executor = ProcessPoolExecutor(max_workers=MAX_CONCURRENT_RENDERS, mp_context=multiprocessing.get_context("spawn"))
 
-def get_user_dir(email: str, show_name: Optional[str] = None):
+def get_owner_keys(email: str, show_name: Optional[str] = None) -> Tuple[str, Optional[str]]:
     import hashlib
-    import re
     email_hash = hashlib.md5(email.lower().strip().encode()).hexdigest()
-    user_dir = os.path.join(TEMP_DIR, email_hash)
-    
+    slug = None
     if show_name:
         # Create a URL-friendly slug from show_name
         slug = re.sub(r'[^a-z0-9]+', '-', show_name.lower()).strip('-')
         if not slug:
             slug = "default-show"
+    return email_hash, slug
+
+def get_user_dir(email: str, show_name: Optional[str] = None):
+    email_hash, slug = get_owner_keys(email, show_name)
+    user_dir = os.path.join(TEMP_DIR, email_hash)
+    if slug:
         user_dir = os.path.join(user_dir, slug)
         
     os.makedirs(user_dir, exist_ok=True)
@@ -154,6 +184,251 @@ def update_rss_feed(user_dir: str, email_hash: str, email: str, podcasts: list,
     tree.write(rss_file, encoding="utf-8", xml_declaration=True)
     return rss_url
 
+# Storage lifecycle settings
+MEDIA_INDEX_FILE = os.getenv("MEDIA_INDEX_FILE", "media_index.json")  # kept outside TEMP_DIR so it is never served
+MEDIA_TTL_HOURS = float(os.getenv("MEDIA_TTL_HOURS", "24"))
+USER_QUOTA_MB = float(os.getenv("USER_QUOTA_MB", "1024"))
+SHOW_QUOTA_MB = float(os.getenv("SHOW_QUOTA_MB", "512"))
+STORAGE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL_SECONDS", "900"))
+STORAGE_ADMIN_TOKEN = os.getenv("STORAGE_ADMIN_TOKEN", "")  # global usage report is disabled when unset
+
+class MediaLifecycleManager:
+    """Tracks generated media by owner/status, expires unpublished files and enforces quotas.
+
+    The lock only guards the in-memory index; file-system work and index writes happen outside
+    it. Handlers call these methods through asyncio.to_thread so they never block the event loop.
+    """
+
+    def __init__(self, root: str, index_file: str, ttl_hours: float, user_quota_mb: float, show_quota_mb: float):
+        self.root = root
+        self.index_file = index_file
+        self.ttl_seconds = ttl_hours * 3600
+        self.user_quota_bytes = int(user_quota_mb * 1024 * 1024)
+        self.show_quota_bytes = int(show_quota_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.in_use_counts: Dict[str, int] = {}
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Media index unreadable, starting fresh: {str(e)}")
+
+    def _save(self):
+        # save_lock orders concurrent writers; the index lock is held just long enough to copy
+        with self.save_lock:
+            with self.lock:
+                snapshot = {key: dict(entry) for key, entry in self.entries.items()}
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(snapshot, f, indent=4)
+            os.replace(tmp_file, self.index_file)
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def _file_size(self, path: str) -> int:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        peaks_path = get_waveform_path(path)
+        if os.path.exists(peaks_path):
+            size += os.path.getsize(peaks_path)
+        return size
+
+    @contextmanager
+    def in_use(self, *paths: str):
+        """Protect files from eviction while a render or publish is working on them."""
+        keys = [self._key(path) for path in paths]
+        with self.lock:
+            for key in keys:
+                self.in_use_counts[key] = self.in_use_counts.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                for key in keys:
+                    self.in_use_counts[key] -= 1
+                    if not self.in_use_counts[key]:
+                        del self.in_use_counts[key]
+
+    def register(self, path: str, kind: str, status: str = "draft", owner: Optional[str] = None, show: Optional[str] = None):
+        size = self._file_size(path)
+        with self.lock:
+            self.entries[self._key(path)] = {
+                "kind": kind,
+                "status": status,
+                "owner": owner,
+                "show": show,
+                "size": size,
+                "created": time.time(),
+            }
+        self._save()
+
+    def mark_published(self, old_path: str, new_path: str, owner: str, show: Optional[str]):
+        size = self._file_size(new_path)
+        with self.lock:
+            new_key = self._key(new_path)
+            entry = (self.entries.pop(self._key(old_path), None)
+                     or self.entries.get(new_key)
+                     or {"kind": "audio", "created": time.time()})
+            entry.update({
+                "status": "published",
+                "owner": owner,
+                "show": show,
+                "size": size,
+            })
+            self.entries[new_key] = entry
+        self._save()
+
+    def resolve(self, filename: str) -> Optional[str]:
+        with self.lock:
+            keys = [key for key in self.entries if os.path.basename(key) == filename]
+        for key in keys:
+            path = os.path.join(self.root, key)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def lookup(self, path: str) -> Tuple[Optional[str], Optional[str]]:
+        with self.lock:
+            entry = self.entries.get(self._key(path))
+            return (entry.get("owner"), entry.get("show")) if entry else (None, None)
+
+    def check_quota(self, owner: str, show: Optional[str], incoming_bytes: int = 0, exclude: Optional[str] = None):
+        # Everything the owner holds counts: drafts and videos as well as published episodes
+        exclude_key = self._key(exclude) if exclude else None
+        with self.lock:
+            owned = [e for key, e in self.entries.items() if e.get("owner") == owner and key != exclude_key]
+        user_usage = sum(e["size"] for e in owned) + incoming_bytes
+        if user_usage > self.user_quota_bytes:
+            raise HTTPException(status_code=507, detail=f"User storage quota of {self.user_quota_bytes // (1024 * 1024)} MB exceeded")
+        show_usage = sum(e["size"] for e in owned if e.get("show") == show) + incoming_bytes
+        if show is not None and show_usage > self.show_quota_bytes:
+            raise HTTPException(status_code=507, detail=f"Show storage quota of {self.show_quota_bytes // (1024 * 1024)} MB exceeded")
+
+    def _referenced_files(self) -> set:
+        # Everything listed in a show's podcasts.json is in its RSS feed and must never be evicted
+        referenced = set()
+        for root, dirs, files in os.walk(self.root):
+            if "podcasts.json" not in files:
+                continue
+            referenced.update(os.path.join(root, name) for name in ("podcasts.json", "rss.xml"))
+            for pod in load_podcasts(root):
+                if pod.get("filename"):
+                    audio_path = os.path.join(root, pod["filename"])
+                    referenced.add(audio_path)
+                    referenced.add(get_waveform_path(audio_path))
+        return referenced
+
+    def _remove(self, path: str):
+        # Publishing may move the file away between the sweep's checks and the delete
+        for target in (path, get_waveform_path(path)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def _is_in_use(self, path: str) -> bool:
+        key = self._key(path)
+        if key.endswith(".peaks.npz"):
+            key = key[:-len(".peaks.npz")] + ".mp3"
+        return key in self.in_use_counts
+
+    def sweep(self):
+        referenced = self._referenced_files()
+        cutoff = time.time() - self.ttl_seconds
+
+        # File-system checks run against a snapshot, without holding the lock
+        with self.lock:
+            snapshot = {key: dict(entry) for key, entry in self.entries.items()}
+        adopted = {}
+        for path in referenced:
+            key = self._key(path)
+            if key in snapshot or not path.endswith(".mp3") or not os.path.exists(path):
+                continue
+            # Adopt feed episodes that predate the index so they count towards quotas
+            parts = key.split(os.sep)
+            adopted[key] = {
+                "kind": "audio",
+                "status": "published",
+                "owner": parts[0],
+                "show": parts[1] if len(parts) > 2 else None,
+                "size": self._file_size(path),
+                "created": os.path.getmtime(path),
+            }
+        missing = {key for key in snapshot if not os.path.exists(os.path.join(self.root, key))}
+
+        expired = []
+        with self.lock:
+            for key, entry in adopted.items():
+                self.entries.setdefault(key, entry)
+            for key in list(self.entries):
+                path = os.path.join(self.root, key)
+                entry = self.entries[key]
+                if self._is_in_use(path):
+                    continue
+                if key in missing:
+                    del self.entries[key]
+                elif path in referenced:
+                    entry["status"] = "published"
+                elif entry["status"] != "published" and entry["created"] < cutoff:
+                    del self.entries[key]
+                    expired.append(path)
+            tracked = {os.path.join(self.root, key) for key in self.entries}
+            in_use = {os.path.join(self.root, key) for key in self.in_use_counts}
+        self._save()
+
+        for path in expired:
+            self._remove(path)
+        removed = len(expired)
+
+        # Untracked leftovers in the root (failed chunks, files from before the index)
+        for entry in os.scandir(self.root):
+            if not entry.is_file() or entry.path in tracked or entry.path in referenced or entry.path in in_use:
+                continue
+            if entry.name.endswith(".peaks.npz"):
+                audio_path = entry.path[:-len(".peaks.npz")] + ".mp3"
+                if audio_path in tracked or audio_path in in_use:
+                    continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+
+        if removed:
+            logger.info(f"Storage sweep removed {removed} expired files")
+
+    def usage(self, owner: Optional[str] = None) -> dict:
+        with self.lock:
+            entries = [dict(e) for e in self.entries.values() if owner is None or e.get("owner") == owner]
+        # Totals only: owner hashes and show slugs are the paths to each user's feed
+        report = {"total_bytes": 0, "by_status": {}}
+        for entry in entries:
+            report["total_bytes"] += entry["size"]
+            report["by_status"][entry["status"]] = report["by_status"].get(entry["status"], 0) + entry["size"]
+        if owner is not None:
+            report["user_quota_bytes"] = self.user_quota_bytes
+            report["show_quota_bytes"] = self.show_quota_bytes
+        else:
+            report["users"] = len({e["owner"] for e in entries if e.get("owner")})
+            report["shows"] = len({(e["owner"], e.get("show")) for e in entries if e.get("owner")})
+            disk = shutil.disk_usage(self.root)
+            report["disk"] = {"total": disk.total, "used": disk.used, "free": disk.free}
+        return report
+
+storage_manager = MediaLifecycleManager(TEMP_DIR, MEDIA_INDEX_FILE, MEDIA_TTL_HOURS, USER_QUOTA_MB, SHOW_QUOTA_MB)
+
+async def run_storage_sweeps():
+    while True:
+        try:
+            await asyncio.to_thread(storage_manager.sweep)
+        except Exception as e:
+            logger.error(f"Storage sweep failed: {str(e)}")
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL_SECONDS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -185,6 +460,8 @@ class AudioRequest(BaseModel):
     speakers: List[Speaker]
     channels: str  # "mono" or "stereo"
     fonada_api_key: str
+    email: Optional[str] = None  # lets drafts count towards the owner's storage quota
+    show_name: Optional[str] = None
 
 class RegenerateRequest(BaseModel):
     script: List[ScriptLine]
@@ -245,7 +522,7 @@ async def generate_audio_chunk(text: str, voice: str, language: str, api_key: st
     for attempt in range(max_retries):
         try:
             logger.info(f"Fonada TTS attempt {attempt + 1} for chunk {chunk_id}")
-            response = requests.post(url, headers=headers, json=data, timeout=60)
+            response = await asyncio.to_thread(requests.post, url, headers=headers, json=data, timeout=60)
             
             if response.status_code == 200:
                 file_path = os.path.join(TEMP_DIR, f"{chunk_id}.mp3")
@@ -276,6 +553,100 @@ async def generate_audio_chunk(text: str, voice: str, language: str, api_key: st
             
     raise HTTPException(status_code=504, detail=f"Fonada TTS timed out after {max_retries} attempts. Last error: {last_error}")
 
+WAVEFORM_SAMPLE_RATE = 16000
+WAVEFORM_BIN_SECONDS = 0.01  # 10ms bins at the finest zoom level
+WAVEFORM_LEVELS = 8  # each level halves the resolution of the previous one
+
+def get_waveform_path(audio_path: str) -> str:
+    return os.path.splitext(audio_path)[0] + ".peaks.npz"
+
+def find_media_file(filename: str) -> Optional[str]:
+    path = os.path.join(TEMP_DIR, filename)
+    if os.path.exists(path):
+        return path
+    # Published episodes live in user subdirectories and are always in the media index,
+    # so the tree is never walked on behalf of a request
+    return storage_manager.resolve(filename)
+
+def compute_waveform_peaks(audio_path: str) -> Dict[str, np.ndarray]:
+    """Decode the audio once and reduce it to per-bin peak/RMS values at several zoom levels."""
+    bin_size = int(WAVEFORM_SAMPLE_RATE * WAVEFORM_BIN_SECONDS)
+    # stderr goes to a tempfile: a damaged MP3 logs one error per frame and would fill a pipe
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = subprocess.Popen([
+            "ffmpeg", "-v", "error", "-i", audio_path,
+            "-ac", "1", "-ar", str(WAVEFORM_SAMPLE_RATE), "-f", "f32le", "-"
+        ], stdout=subprocess.PIPE, stderr=stderr_file)
+
+        # Stream the PCM in ~1s blocks so long episodes never sit fully in memory
+        block_bytes = bin_size * 100 * 4
+        peaks, rms, leftover = [], [], np.zeros(0, dtype=np.float32)
+        total_samples = 0
+        try:
+            while True:
+                raw = proc.stdout.read(block_bytes)
+                if not raw:
+                    break
+                samples = np.concatenate((leftover, np.frombuffer(raw, dtype=np.float32)))
+                usable = (len(samples) // bin_size) * bin_size
+                bins = samples[:usable].reshape(-1, bin_size)
+                leftover = samples[usable:]
+                total_samples += usable
+                peaks.append(np.max(np.abs(bins), axis=1))
+                rms.append(np.sqrt(np.mean(np.square(bins), axis=1)))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            returncode = proc.wait()
+
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read(4096).decode(errors="replace")
+            raise RuntimeError(f"ffmpeg decode failed: {stderr}")
+
+    if len(leftover):
+        total_samples += len(leftover)
+        peaks.append(np.array([np.max(np.abs(leftover))], dtype=np.float32))
+        rms.append(np.array([np.sqrt(np.mean(np.square(leftover)))], dtype=np.float32))
+
+    level_peaks = np.concatenate(peaks) if peaks else np.zeros(0, dtype=np.float32)
+    level_rms = np.concatenate(rms) if rms else np.zeros(0, dtype=np.float32)
+
+    waveform = {
+        "bin_seconds": np.array(WAVEFORM_BIN_SECONDS),
+        "duration": np.array(total_samples / WAVEFORM_SAMPLE_RATE),
+    }
+    for level in range(WAVEFORM_LEVELS):
+        waveform[f"peaks_{level}"] = level_peaks.astype(np.float16)
+        waveform[f"rms_{level}"] = level_rms.astype(np.float16)
+        # Merge neighbouring bins pairwise for the next (coarser) level; an odd last bin
+        # is paired with itself so it keeps its own peak/RMS instead of being halved
+        if len(level_peaks) % 2:
+            level_peaks = np.append(level_peaks, level_peaks[-1])
+            level_rms = np.append(level_rms, level_rms[-1])
+        level_peaks = level_peaks.reshape(-1, 2).max(axis=1)
+        level_rms = np.sqrt(np.square(level_rms).reshape(-1, 2).mean(axis=1))
+    return waveform
+
+def save_waveform_peaks(audio_path: str) -> Dict[str, np.ndarray]:
+    waveform = compute_waveform_peaks(audio_path)
+    waveform_path = get_waveform_path(audio_path)
+    tmp_path = waveform_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **waveform)
+    os.replace(tmp_path, waveform_path)
+    return waveform
+
+def load_waveform_peaks(audio_path: str) -> Dict[str, np.ndarray]:
+    waveform_path = get_waveform_path(audio_path)
+    if os.path.exists(waveform_path):
+        with np.load(waveform_path) as data:
+            return {key: data[key] for key in data.files}
+    # Episodes assembled before peaks were precomputed get them on first use
+    logger.info(f"No waveform peaks for {audio_path}, computing them now")
+    return save_waveform_peaks(audio_path)
+
 def generate_waveform_video(audio_path, title):
     audio = AudioFileClip(audio_path)
     duration = audio.duration
@@ -299,10 +670,11 @@ def generate_waveform_video(audio_path, title):
 
     bg_img_base = create_premium_bg()
 
-    # Audio Data
-    audio_data = audio.to_soundarray(fps=44100)
-    if len(audio_data.shape) > 1:
-        audio_data = np.mean(audio_data, axis=1)
+    # Audio Data (precomputed RMS bins, so the audio is not decoded again)
+    waveform = load_waveform_peaks(audio_path)
+    bin_seconds = float(waveform["bin_seconds"])
+    rms_bins = waveform["rms_0"].astype(np.float64)
+    energy_cumsum = np.concatenate(([0.0], np.cumsum(np.square(rms_bins))))
 
     num_bars = 110
     bar_width = 4
@@ -322,9 +694,11 @@ def generate_waveform_video(audio_path, title):
             'alpha': random.randint(30, 100)
         })
 
-    def get_rms(segment):
-        if len(segment) == 0: return 0
-        return np.sqrt(np.mean(np.square(segment)))
+    def get_rms(start_t, end_t):
+        start = int(start_t / bin_seconds)
+        end = min(len(rms_bins), int(np.ceil(end_t / bin_seconds)))
+        if end <= start: return 0
+        return np.sqrt((energy_cumsum[end] - energy_cumsum[start]) / (end - start))
 
     try:
         font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", 85)
@@ -349,10 +723,7 @@ def generate_waveform_video(audio_path, title):
             time_offset = (i - num_bars/2) * 0.003
             t_bar = max(0, min(duration, t + time_offset))
             
-            b_start = int(max(0, t_bar - 0.02) * 44100)
-            b_end = int(min(len(audio_data), t_bar + 0.02) * 44100)
-            b_seg = audio_data[b_start:b_end]
-            b_rms = get_rms(b_seg)
+            b_rms = get_rms(max(0, t_bar - 0.02), t_bar + 0.02)
             
             h_val = int(b_rms * 700) + 4
             h_val = min(h_val, max_height)
@@ -479,22 +850,30 @@ async def upload_content(file: UploadFile = File(...)):
 async def create_video(
     fastapi_request: Request,
     audio_filename: str = Form(...),
-    title: str = Form("AI Podcast")
+    title: str = Form("AI Podcast"),
+    email: Optional[str] = Form(None),
+    show_name: Optional[str] = Form(None)
 ):
     try:
-        audio_path = os.path.join(TEMP_DIR, audio_filename)
-        # Fallback: Search in user subdirectories if not found in root
-        if not os.path.exists(audio_path):
-            for root, dirs, files in os.walk(TEMP_DIR):
-                if audio_filename in files:
-                    audio_path = os.path.join(root, audio_filename)
-                    break
-
-        if not os.path.exists(audio_path):
+        audio_path = await asyncio.to_thread(find_media_file, audio_filename)
+        if not audio_path:
             raise HTTPException(status_code=404, detail="Audio file not found")
 
+        # Videos belong to whoever owns the source audio, else to the requesting email
+        owner, show_slug = await asyncio.to_thread(storage_manager.lookup, audio_path)
+        if not owner and email:
+            owner, show_slug = get_owner_keys(email, show_name)
+        if owner:
+            await asyncio.to_thread(storage_manager.check_quota, owner, show_slug)
+
         # Generate Animated Waveform Video
-        output_path, output_filename = generate_waveform_video(audio_path, title)
+        # Render in a worker process so media downloads keep flowing on the event loop;
+        # the source audio stays protected from eviction while queued and rendering
+        with storage_manager.in_use(audio_path):
+            async with render_semaphore:
+                loop = asyncio.get_running_loop()
+                output_path, output_filename = await loop.run_in_executor(render_executor, generate_waveform_video, audio_path, title)
+        await asyncio.to_thread(storage_manager.register, output_path, kind="video", owner=owner, show=show_slug)
         
         scheme = fastapi_request.headers.get("x-forwarded-proto", fastapi_request.url.scheme)
         base_url = f"{scheme}://{fastapi_request.url.netloc}"
@@ -504,6 +883,8 @@ async def create_video(
             "video_url": f"{base_url}/audio/{output_filename}",
             "filename": output_filename
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Video Generation Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
@@ -540,6 +921,9 @@ async def audio_from_script(request: AudioRequest, fastapi_request: Request):
     # 1. Process Script into audio chunks
     audio_files = []
     session_id = str(uuid.uuid4())
+    owner, show_slug = get_owner_keys(request.email, request.show_name) if request.email else (None, None)
+    if owner:
+        await asyncio.to_thread(storage_manager.check_quota, owner, show_slug)
     
     logger.info(f"Starting sequential audio generation for session {session_id}")
     try:
@@ -590,7 +974,7 @@ async def audio_from_script(request: AudioRequest, fastapi_request: Request):
     try:
         if N == 1:
             # Single file - just encode directly
-            subprocess.run([
+            await asyncio.to_thread(subprocess.run, [
                 "ffmpeg", "-i", audio_files[0],
                 "-ac", channel_count, "-ar", sample_rate,
                 "-acodec", "libmp3lame", "-b:a", "128k",
@@ -637,7 +1021,7 @@ async def audio_from_script(request: AudioRequest, fastapi_request: Request):
                 "-acodec", "libmp3lame", "-b:a", "128k",
                 output_path, "-y"
             ]
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            result = await asyncio.to_thread(subprocess.run, cmd, check=True, capture_output=True, text=True)
             logger.info(f"Assembly complete. Final MP3 size: {os.path.getsize(output_path)} bytes")
 
     except subprocess.CalledProcessError as e:
@@ -653,15 +1037,121 @@ async def audio_from_script(request: AudioRequest, fastapi_request: Request):
             if os.path.exists(wav):
                 os.remove(wav)
 
+    # 3. Precompute waveform peaks once so the player and video renderer never re-decode the MP3
+    try:
+        await asyncio.to_thread(save_waveform_peaks, output_path)
+    except Exception as e:
+        logger.warning(f"Waveform precompute failed for {output_filename}: {str(e)}")
+    await asyncio.to_thread(storage_manager.register, output_path, kind="audio", owner=owner, show=show_slug)
+
     scheme = fastapi_request.headers.get("x-forwarded-proto", fastapi_request.url.scheme)
     base_url = f"{scheme}://{fastapi_request.url.netloc}"
     
     return {
         "message": "Audio generated successfully", 
         "audio_url": f"{base_url}/audio/{output_filename}",
+        "waveform_url": f"{base_url}/waveform/{output_filename}",
         "filename": output_filename
     }
 
+@app.api_route("/audio/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_media(file_path: str, fastapi_request: Request):
+    root = os.path.realpath(TEMP_DIR)
+    full_path = os.path.realpath(os.path.join(root, file_path))
+    if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    filename = os.path.basename(full_path)
+    stat = os.stat(full_path)
+    etag = f'"{int(stat.st_mtime)}-{stat.st_size}"'
+    media_type = "application/rss+xml" if filename == "rss.xml" else None
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+    if IMMUTABLE_MEDIA_PATTERN.match(filename):
+        headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        # Feeds and episode lists change on every publish; let clients revalidate cheaply via ETag
+        headers["Cache-Control"] = "no-cache"
+
+    if fastapi_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if MEDIA_ACCEL_REDIRECT_PREFIX:
+        # nginx takes over the transfer (sendfile, ranges) and frees this worker immediately
+        rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(rel_path)
+        return Response(headers=headers, media_type=media_type)
+
+    # FileResponse answers Range/If-Range with 206 partial content, reads the file off the
+    # event loop and uses the server's zero-copy pathsend extension when it is available
+    return FileResponse(full_path, headers=headers, media_type=media_type, stat_result=stat)
+
+def build_waveform_window(waveform: Dict[str, np.ndarray], level: Optional[int], max_bins: Optional[int],
+                          start: float, end: Optional[float]) -> dict:
+    num_levels = len([key for key in waveform if key.startswith("peaks_")])
+    base_bin_seconds = float(waveform["bin_seconds"])
+    duration = float(waveform["duration"])
+    end = duration if end is None else min(end, duration)
+    if start < 0 or end <= start:
+        raise HTTPException(status_code=400, detail="Invalid time window")
+
+    def window_bounds(l):
+        bin_seconds = base_bin_seconds * (2 ** l)
+        return int(start / bin_seconds), int(np.ceil(end / bin_seconds))
+
+    def window_bins(l):
+        first, last = window_bounds(l)
+        return last - first
+
+    if max_bins:
+        # Finest level whose window fits in the requested number of bins (coarsest if none do)
+        level = next((l for l in range(num_levels) if window_bins(l) <= max_bins), num_levels - 1)
+    elif level is None:
+        level = num_levels - 1
+    if level < 0 or level >= num_levels:
+        raise HTTPException(status_code=400, detail=f"Level must be between 0 and {num_levels - 1}")
+
+    first, last = window_bounds(level)
+    return {
+        "level": level,
+        "levels": num_levels,
+        "bin_seconds": base_bin_seconds * (2 ** level),
+        "duration": duration,
+        "start": first * base_bin_seconds * (2 ** level),
+        "peaks": np.round(waveform[f"peaks_{level}"][first:last].astype(np.float32), 4).tolist(),
+        "rms": np.round(waveform[f"rms_{level}"][first:last].astype(np.float32), 4).tolist(),
+    }
+
+@app.get("/waveform/{filename}")
+async def get_waveform(filename: str, fastapi_request: Request, level: Optional[int] = None,
+                       max_bins: Optional[int] = None, start: float = 0.0, end: Optional[float] = None):
+    if not PODCAST_AUDIO_PATTERN.match(filename):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+
+    audio_path = await asyncio.to_thread(find_media_file, filename)
+    if not audio_path:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    try:
+        waveform = await asyncio.to_thread(load_waveform_peaks, audio_path)
+    except Exception as e:
+        logger.error(f"Waveform load failed for {filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Waveform extraction failed")
+
+    # Podcast filenames are UUID based and never rewritten, so the peaks are immutable
+    stat = os.stat(get_waveform_path(audio_path))
+    etag = f'"{int(stat.st_mtime)}-{stat.st_size}-{level}-{max_bins}-{start}-{end}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+    }
+    if fastapi_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # Slicing and JSON encoding of a long episode is real work, keep it off the event loop
+    content = await asyncio.to_thread(build_waveform_window, waveform, level, max_bins, start, end)
+    body = await asyncio.to_thread(json.dumps, {"filename": filename, **content})
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.post("/publish-to-rss")
 async def publish_to_rss(request: PublishRequest, fastapi_request: Request):
     try:
@@ -670,20 +1160,31 @@ async def publish_to_rss(request: PublishRequest, fastapi_request: Request):
         # Move audio file to user directory if it's currently in root TEMP_DIR
         source_path = os.path.join(TEMP_DIR, request.filename)
         dest_path = os.path.join(user_dir, request.filename)
-        
-        if os.path.exists(source_path):
-            import shutil
-            shutil.move(source_path, dest_path)
-        elif not os.path.exists(dest_path):
-            # Fallback: check if it's in a different folder (maybe user generated multiple times)
-            found = False
-            for root, dirs, files in os.walk(TEMP_DIR):
-                if request.filename in files:
-                    shutil.move(os.path.join(root, request.filename), dest_path)
-                    found = True
-                    break
-            if not found:
+        show_slug = os.path.basename(user_dir) if request.show_name else None
+
+        if not os.path.exists(dest_path):
+            incoming_path = await asyncio.to_thread(find_media_file, request.filename)
+            if incoming_path:
+                # The file itself may already be counted as this owner's draft
+                await asyncio.to_thread(storage_manager.check_quota, email_hash, show_slug,
+                                        os.path.getsize(incoming_path), incoming_path)
+
+        if not os.path.exists(source_path) and not os.path.exists(dest_path):
+            # Fallback: it may already be published to a different show
+            found_path = await asyncio.to_thread(find_media_file, request.filename)
+            if not found_path:
                 raise HTTPException(status_code=404, detail="Audio file not found for publishing")
+            source_path = found_path
+
+        # The sweep must not evict the MP3 or its peaks while they are being moved
+        with storage_manager.in_use(source_path, dest_path):
+            if os.path.exists(source_path) and source_path != dest_path:
+                shutil.move(source_path, dest_path)
+            # Keep the precomputed waveform peaks next to the audio
+            source_peaks = get_waveform_path(source_path)
+            if os.path.exists(source_peaks) and source_peaks != get_waveform_path(dest_path):
+                shutil.move(source_peaks, get_waveform_path(dest_path))
+            await asyncio.to_thread(storage_manager.mark_published, source_path, dest_path, email_hash, show_slug)
             
         podcasts = load_podcasts(user_dir)
         
@@ -707,10 +1208,24 @@ async def publish_to_rss(request: PublishRequest, fastapi_request: Request):
             "message": "Episode published to RSS feed successfully",
             "rss_url": rss_url
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Publish failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to publish to RSS: {str(e)}")
 
+@app.get("/storage/usage")
+async def storage_usage(fastapi_request: Request, email: Optional[str] = None):
+    if email:
+        owner, _ = get_owner_keys(email)
+        return await asyncio.to_thread(storage_manager.usage, owner)
+
+    import secrets
+    token = fastapi_request.headers.get("x-admin-token", "")
+    if not STORAGE_ADMIN_TOKEN or not secrets.compare_digest(token, STORAGE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required for the global storage report")
+    return await asyncio.to_thread(storage_manager.usage)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import {
   Plus, Trash2, Play, Download, Settings,
@@ -94,6 +94,7 @@ function App() {
   const [generatedScript, setGeneratedScript] = useState([]);
   const [isGenerating, setIsGenerating] = useState(false);
   const [audioUrl, setAudioUrl] = useState('');
+  const [waveformUrl, setWaveformUrl] = useState('');
   const [error, setError] = useState('');
 
   useEffect(() => {
@@ -155,15 +156,18 @@ function App() {
     setError('');
     setIsGenerating(true);
     setAudioUrl('');
+    setWaveformUrl('');
     setStudioStep('processing');
     try {
       console.log('Sending audio generation request with script:', generatedScript);
       const response = await axios.post(`${API_BASE_URL}/audio-from-script`, {
-        script: generatedScript, speakers, channels, fonada_api_key: fonadaKey
+        script: generatedScript, speakers, channels, fonada_api_key: fonadaKey,
+        email: userEmail || null, show_name: showName || null
       });
       console.log('Backend response:', response.data);
       if (response.data.audio_url) {
         setAudioUrl(response.data.audio_url);
+        setWaveformUrl(response.data.waveform_url || '');
         setAudioFilename(response.data.filename);
         setStudioStep('done');
       } else {
@@ -209,6 +213,8 @@ function App() {
     const formData = new FormData();
     formData.append('audio_filename', audioFilename);
     formData.append('title', topic || 'My Podcast');
+    if (userEmail) formData.append('email', userEmail);
+    if (showName) formData.append('show_name', showName);
 
     try {
       const response = await axios.post(`${API_BASE_URL}/create-video`, formData, {
@@ -295,6 +301,7 @@ function App() {
             addSpeaker={addSpeaker}
             audioUrl={audioUrl}
             setAudioUrl={setAudioUrl}
+            waveformUrl={waveformUrl}
             error={error}
             showTopicExplorer={showTopicExplorer}
             setShowTopicExplorer={setShowTopicExplorer}
@@ -546,6 +553,78 @@ const LandingPage = ({ setView }) => (
 );
 
 
+const WaveformPlayer = ({ audioUrl, waveformUrl }) => {
+  const audioRef = useRef(null);
+  const canvasRef = useRef(null);
+  const [waveform, setWaveform] = useState(null);
+  const [progress, setProgress] = useState(0);
+
+  useEffect(() => {
+    setWaveform(null);
+    if (!waveformUrl) return;
+    // Ask for roughly one bin per pixel; the backend picks the matching zoom level
+    const width = canvasRef.current?.clientWidth || 800;
+    axios.get(waveformUrl, { params: { max_bins: width } })
+      .then(res => setWaveform(res.data))
+      .catch(err => console.error('Waveform fetch error:', err));
+  }, [waveformUrl]);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    if (!canvas || !waveform) return;
+    const ratio = window.devicePixelRatio || 1;
+    canvas.width = canvas.clientWidth * ratio;
+    canvas.height = canvas.clientHeight * ratio;
+    const ctx = canvas.getContext('2d');
+    const { peaks, rms } = waveform;
+    const barWidth = canvas.width / Math.max(peaks.length, 1);
+    const mid = canvas.height / 2;
+    const maxPeak = Math.max(...peaks, 0.01);
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    peaks.forEach((peak, i) => {
+      const played = i / peaks.length < progress;
+      const peakH = (peak / maxPeak) * mid;
+      const rmsH = (rms[i] / maxPeak) * mid;
+      ctx.fillStyle = played ? 'rgba(99, 102, 241, 0.45)' : 'rgba(150, 150, 180, 0.3)';
+      ctx.fillRect(i * barWidth, mid - peakH, Math.max(barWidth - 1, 1), peakH * 2);
+      ctx.fillStyle = played ? 'rgba(99, 102, 241, 1)' : 'rgba(150, 150, 180, 0.7)';
+      ctx.fillRect(i * barWidth, mid - rmsH, Math.max(barWidth - 1, 1), rmsH * 2);
+    });
+  }, [waveform, progress]);
+
+  const handleTimeUpdate = () => {
+    const audio = audioRef.current;
+    if (audio && audio.duration) setProgress(audio.currentTime / audio.duration);
+  };
+
+  const handleSeek = (event) => {
+    const audio = audioRef.current;
+    if (!audio || !audio.duration) return;
+    const rect = event.currentTarget.getBoundingClientRect();
+    audio.currentTime = ((event.clientX - rect.left) / rect.width) * audio.duration;
+  };
+
+  return (
+    <div style={{ marginTop: '1.2rem' }}>
+      {waveformUrl && (
+        <canvas
+          ref={canvasRef}
+          onClick={handleSeek}
+          style={{ width: '100%', height: '80px', cursor: 'pointer', display: 'block' }}
+        />
+      )}
+      <audio
+        ref={audioRef}
+        controls
+        src={audioUrl}
+        onTimeUpdate={handleTimeUpdate}
+        style={{ marginTop: '0.8rem', width: '100%', borderRadius: '1rem' }}
+      />
+    </div>
+  );
+};
+
 const StudioView = ({
   setView, studioStep, setStudioStep, inputMode, setInputMode, topic, setTopic,
   content, setContent, language, setLanguage,
@@ -553,7 +632,7 @@ const StudioView = ({
   speakers, setSpeakers, VOICES, fonadaKey, setFonadaKey,
   llmKey, setLlmKey, isGenerating, generateScript, regeneratePart, generateAudio,
   generatedScript, setGeneratedScript, updateSpeaker, addSpeaker,
-  audioUrl, setAudioUrl, error, showTopicExplorer, setShowTopicExplorer,
+  audioUrl, setAudioUrl, waveformUrl, error, showTopicExplorer, setShowTopicExplorer,
   handleFileUpload,
   publishPlatform, setPublishPlatform,
   generateVideo, isVideoGenerating, videoUrl,
@@ -778,7 +857,7 @@ const StudioView = ({
               </div>
             </div>
             {audioUrl ? (
-              <audio controls src={audioUrl} style={{ marginTop: '1.2rem', width: '100%', borderRadius: '1rem' }} />
+              <WaveformPlayer audioUrl={audioUrl} waveformUrl={waveformUrl} />
             ) : (
               <div style={{ marginTop: '2rem', padding: '2rem', textAlign: 'center', background: 'rgba(239, 68, 68, 0.1)', borderRadius: '1rem', border: '1px solid #ef4444' }}>
                 <p style={{ color: '#ef4444', fontWeight: 600 }}>Audio generated but the file URL is missing. Please try again or check logs.</p>